@@ -5,35 +5,79 @@ Handles caching, rate limiting, and statistics
 
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import Optional, Dict, Any
-import aioredis
+from typing import Optional, Dict, Any, List
+from redis import asyncio as aioredis
+from redis.utils import HIREDIS_AVAILABLE
+import msgspec
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Cache payloads are stored as MessagePack; legacy JSON entries are upgraded on read.
+# news:* keys changed with the xxh3 key scheme, so only keys written through
+# set() by a JSON-era CacheManager under a key name still in use can be legacy.
+encoder = msgspec.msgpack.Encoder(enc_hook=str)
+decoder = msgspec.msgpack.Decoder()
+
+# How long a Redis INFO snapshot is reused by get_stats
+INFO_CACHE_SECONDS = 5
+
+# Seconds between background Redis pings that refresh is_connected()
+HEARTBEAT_INTERVAL = 2
+
+# Keys per SCAN page and per UNLINK call in flush_cache
+FLUSH_BATCH_SIZE = 500
+
+# Fixed-window counter: INCR and set the window expiry on first hit, atomically
+RATE_LIMIT_LUA = """
+local v = redis.call('INCR', KEYS[1])
+if v == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return v
+"""
+
 class CacheManager:
     """Redis-based cache and rate limiting manager"""
     
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
+        self.pool: Optional[aioredis.ConnectionPool] = None
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        self.stats = {"hits": 0, "misses": 0, "total": 0}
+        self.max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", 32))
+        # Plain int counters; total is derived in get_stats
+        self._hits = 0
+        self._misses = 0
+        self._rate_limit_script = None
+        # (fetched_at, subset of INFO) reused for INFO_CACHE_SECONDS
+        self._info_cache = (0.0, {})
+        # Connection status maintained by the heartbeat task
+        self._alive = False
+        self._heartbeat_task: Optional[asyncio.Task] = None
         
     async def connect(self):
         """Connect to Redis"""
         try:
-            self.redis = aioredis.from_url(
+            self.pool = aioredis.ConnectionPool.from_url(
                 self.redis_url,
-                encoding="utf-8",
-                decode_responses=True,
+                max_connections=self.max_connections,
+                decode_responses=False,
                 socket_connect_timeout=5,
                 socket_timeout=5
             )
+            self.redis = aioredis.Redis(connection_pool=self.pool)
             
             # Test connection
             await self.redis.ping()
+            self._rate_limit_script = self.redis.register_script(RATE_LIMIT_LUA)
+            self._alive = True
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
             logger.info("Redis connected successfully")
+            if not HIREDIS_AVAILABLE:
+                logger.warning("hiredis not installed, using pure-Python Redis parser")
             
         except Exception as e:
             logger.error(f"Redis connection failed: {str(e)}")
@@ -41,19 +85,35 @@ class CacheManager:
     
     async def disconnect(self):
         """Disconnect from Redis"""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        self._alive = False
         if self.redis:
-            await self.redis.close()
+            await self.redis.aclose()
+        if self.pool:
+            await self.pool.disconnect()
             logger.info("Redis disconnected")
     
+    async def _heartbeat(self):
+        """Ping Redis periodically and record whether it is reachable"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.redis.ping()
+                self._alive = True
+            except Exception:
+                if self._alive:
+                    logger.warning("Redis heartbeat failed")
+                self._alive = False
+    
     async def is_connected(self) -> bool:
-        """Check Redis connection status"""
-        if not self.redis:
-            return False
-        try:
-            await self.redis.ping()
-            return True
-        except:
-            return False
+        """Check Redis connection status (as of the last heartbeat)"""
+        return self._alive
     
     async def get(self, key: str) -> Optional[Dict[str, Any]]:
         """Get cached value"""
@@ -63,12 +123,16 @@ class CacheManager:
         try:
             value = await self.redis.get(key)
             if value:
-                self.stats["hits"] += 1
-                self.stats["total"] += 1
-                return json.loads(value)
+                self._hits += 1
+                try:
+                    return decoder.decode(value)
+                except msgspec.DecodeError:
+                    # Legacy JSON entry - re-encode so it upgrades lazily
+                    data = json.loads(value)
+                    await self._upgrade_legacy({key: data})
+                    return data
             else:
-                self.stats["misses"] += 1
-                self.stats["total"] += 1
+                self._misses += 1
                 return None
                 
         except Exception as e:
@@ -81,12 +145,69 @@ class CacheManager:
             return False
         
         try:
-            await self.redis.setex(key, ttl, json.dumps(value, default=str))
+            await self.redis.setex(key, ttl, encoder.encode(value))
             return True
         except Exception as e:
             logger.error(f"Cache set error: {str(e)}")
             return False
     
+    async def mget(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get multiple cached values in a single round-trip"""
+        if not self.redis or not keys:
+            return [None] * len(keys)
+        
+        try:
+            values = await self.redis.mget(keys)
+            results = []
+            legacy = {}
+            for key, value in zip(keys, values):
+                if value:
+                    self._hits += 1
+                    try:
+                        results.append(decoder.decode(value))
+                    except msgspec.DecodeError:
+                        data = json.loads(value)
+                        legacy[key] = data
+                        results.append(data)
+                else:
+                    self._misses += 1
+                    results.append(None)
+            if legacy:
+                await self._upgrade_legacy(legacy)
+            return results
+                
+        except Exception as e:
+            logger.error(f"Cache mget error: {str(e)}")
+            return [None] * len(keys)
+    
+    async def _upgrade_legacy(self, items: Dict[str, Dict[str, Any]]):
+        """Re-encode legacy JSON entries as MessagePack, keeping their remaining TTL"""
+        pipe = self.redis.pipeline(transaction=False)
+        for key in items:
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for (key, data), ttl in zip(items.items(), ttls):
+            if ttl > 0:
+                pipe.setex(key, ttl, encoder.encode(data))
+        await pipe.execute()
+    
+    async def mset(self, items: Dict[str, Dict[str, Any]], ttl: int = 43200) -> bool:
+        """Set multiple cached values with TTL in one pipelined flush"""
+        if not self.redis or not items:
+            return False
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl, encoder.encode(value))
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Cache mset error: {str(e)}")
+            return False
+    
     async def delete(self, key: str) -> bool:
         """Delete cached value"""
         if not self.redis:
@@ -109,20 +230,8 @@ class CacheManager:
         
         try:
             key = f"rate_limit:{identifier}"
-            current = await self.redis.get(key)
-            
-            if current is None:
-                # First request
-                await self.redis.setex(key, window, 1)
-                return True
-            
-            current_count = int(current)
-            if current_count >= limit:
-                return False
-            
-            # Increment counter
-            await self.redis.incr(key)
-            return True
+            count = await self._rate_limit_script(keys=[key], args=[window])
+            return int(count) <= limit
             
         except Exception as e:
             logger.error(f"Rate limit check error: {str(e)}")
@@ -135,8 +244,10 @@ class CacheManager:
         
         try:
             key = f"rate_limit:{identifier}"
-            current = await self.redis.get(key)
-            ttl = await self.redis.ttl(key)
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(key)
+            pipe.ttl(key)
+            current, ttl = await pipe.execute()
             
             count = int(current) if current else 0
             remaining = max(0, 100 - count)
@@ -154,17 +265,30 @@ class CacheManager:
     
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        stats = self.stats.copy()
+        stats = {
+            "hits": self._hits,
+            "misses": self._misses,
+            "total": self._hits + self._misses
+        }
         
         if self.redis:
             try:
-                # Get Redis info
-                info = await self.redis.info()
-                stats.update({
-                    "redis_memory": info.get("used_memory_human", "N/A"),
-                    "redis_connected_clients": info.get("connected_clients", 0),
-                    "redis_uptime": info.get("uptime_in_seconds", 0)
-                })
+                # Refresh Redis info at most every INFO_CACHE_SECONDS, only the needed sections
+                now = time.monotonic()
+                fetched_at, info = self._info_cache
+                if now - fetched_at > INFO_CACHE_SECONDS:
+                    pipe = self.redis.pipeline(transaction=False)
+                    pipe.info("memory")
+                    pipe.info("clients")
+                    pipe.info("server")
+                    memory, clients, server = await pipe.execute()
+                    info = {
+                        "redis_memory": memory.get("used_memory_human", "N/A"),
+                        "redis_connected_clients": clients.get("connected_clients", 0),
+                        "redis_uptime": server.get("uptime_in_seconds", 0)
+                    }
+                    self._info_cache = (now, info)
+                stats.update(info)
             except Exception as e:
                 logger.error(f"Failed to get Redis stats: {str(e)}")
         
@@ -177,12 +301,19 @@ class CacheManager:
         
         try:
             if pattern:
-                keys = await self.redis.keys(pattern)
-                if keys:
-                    return await self.redis.delete(*keys)
-                return 0
+                # SCAN + UNLINK in batches so Redis never blocks on KEYS or large deletes
+                total = 0
+                batch = []
+                async for key in self.redis.scan_iter(match=pattern, count=FLUSH_BATCH_SIZE):
+                    batch.append(key)
+                    if len(batch) >= FLUSH_BATCH_SIZE:
+                        total += await self.redis.unlink(*batch)
+                        batch.clear()
+                if batch:
+                    total += await self.redis.unlink(*batch)
+                return total
             else:
-                await self.redis.flushdb()
+                await self.redis.flushdb(asynchronous=True)
                 return 1
                 
         except Exception as e:
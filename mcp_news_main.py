@@ -7,9 +7,11 @@ import os
 import logging
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+import msgspec
 import uvicorn
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 
 from news_analyzer import CryptoNewsAnalyzer
@@ -19,6 +21,8 @@ from response_models import (
     MCPRequest, 
     MCPResponse,
     BatchNewsRequest,
+    BatchNewsStruct,
+    NewsItemStruct,
     SingleNewsRequest
 )
 from cache_manager import CacheManager
@@ -30,7 +34,8 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
     handlers=[
-        logging.FileHandler('logs/mcp-news-v2.1.log'),
+        # One file per worker process so multi-worker writes don't interleave
+        logging.FileHandler(f'logs/mcp-news-v2.1.{os.getpid()}.log'),
         logging.StreamHandler()
     ]
 )
@@ -54,6 +59,9 @@ async def lifespan(app: FastAPI):
         webhook_manager = WebhookManager()
         analyzer = CryptoNewsAnalyzer(cache_manager)
         
+        # Build and cache the OpenAPI schema now instead of on the first /docs hit
+        app.openapi()
+        
         logger.info("MCP-News v2.1 started at 0.0.0.0:8000")
         logger.info("Tools available: [news_analysis]")
         logger.info("Redis cache connected")
@@ -67,6 +75,10 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    if analyzer:
+        await analyzer.aclose()
+    if webhook_manager:
+        await webhook_manager.close()
     if cache_manager:
         await cache_manager.disconnect()
     logger.info("MCP-News v2.1 shutdown complete")
@@ -76,6 +88,7 @@ app = FastAPI(
     title="MCP-News v2.1",
     description="AI-Powered Cryptocurrency News Analysis Server",
     version="2.1.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -126,12 +139,21 @@ async def health_check():
     )
 
 @app.post("/mcp", response_model=MCPResponse)
-async def mcp_endpoint(request: MCPRequest, _: bool = Depends(verify_token)):
+async def mcp_endpoint(
+    request: MCPRequest, 
+    background_tasks: BackgroundTasks, 
+    idempotency_key: Optional[str] = Header(None),
+    _: bool = Depends(verify_token)
+):
     """
     Main MCP JSON-RPC 2.0 endpoint for news analysis
     Supports both single and batch processing
     """
-    request_id = f"mcp_{request.id}_{datetime.utcnow().strftime('%H%M%S')}"
+    # A client-supplied Idempotency-Key keeps the id (and webhook dedup) stable across retries
+    if idempotency_key:
+        request_id = f"mcp_{idempotency_key}"
+    else:
+        request_id = f"mcp_{request.id}_{datetime.utcnow().strftime('%H%M%S')}"
     
     try:
         logger.info(f"[{request_id}] MCP request: {request.method}")
@@ -146,15 +168,18 @@ async def mcp_endpoint(request: MCPRequest, _: bool = Depends(verify_token)):
                 # Check if it's batch or single request
                 if "news" in arguments:
                     # Batch processing
-                    news_items = arguments["news"]
-                    if not news_items or not isinstance(news_items, list):
+                    try:
+                        news_items = msgspec.convert(arguments["news"], List[NewsItemStruct])
+                    except msgspec.ValidationError as e:
+                        raise HTTPException(400, f"Invalid batch news format: {e}")
+                    if not news_items:
                         raise HTTPException(400, "Invalid batch news format")
                     
                     results = await analyzer.analyze_batch(news_items, request_id)
                     
-                    # Send webhook if configured
+                    # Send webhook after the response so retries don't delay it
                     if webhook_manager:
-                        await webhook_manager.send_batch_results(results, request_id)
+                        background_tasks.add_task(webhook_manager.send_batch_results, results, request_id)
                     
                     logger.info(f"[{request_id}] Batch analysis completed: {len(results)} items")
                     
@@ -179,7 +204,7 @@ async def mcp_endpoint(request: MCPRequest, _: bool = Depends(verify_token)):
                     return MCPResponse(
                         jsonrpc="2.0",
                         id=request.id,
-                        result=result.dict()
+                        result=result.model_dump()
                     )
             
             else:
@@ -234,22 +259,64 @@ async def mcp_endpoint(request: MCPRequest, _: bool = Depends(verify_token)):
             }
         )
 
-@app.post("/analyze")
+def _inline_schema(model) -> Dict[str, Any]:
+    """JSON schema for a model with its $defs inlined (for openapi_extra bodies)"""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+    
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref and ref.startswith("#/$defs/"):
+                return resolve(defs[ref.rsplit("/", 1)[1]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+    
+    return resolve(schema)
+
+@app.post(
+    "/analyze",
+    # The body is decoded by msgspec, so document it explicitly
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _inline_schema(BatchNewsRequest)}}
+        }
+    }
+)
 async def analyze_endpoint(
-    request: BatchNewsRequest, 
+    request: Request, 
+    background_tasks: BackgroundTasks, 
+    idempotency_key: Optional[str] = Header(None),
     _: bool = Depends(verify_token)
 ):
-    """REST endpoint for batch news analysis (n8n compatible)"""
-    request_id = f"rest_{datetime.utcnow().strftime('%H%M%S%f')}"
+    """
+    REST endpoint for batch news analysis (n8n compatible)
+    Body follows BatchNewsRequest and is decoded with msgspec directly
+    """
+    # A client-supplied Idempotency-Key keeps the id (and webhook dedup) stable across retries
+    if idempotency_key:
+        request_id = f"rest_{idempotency_key}"
+    else:
+        request_id = f"rest_{datetime.utcnow().strftime('%H%M%S%f')}"
+    
+    try:
+        batch = msgspec.json.decode(await request.body(), type=BatchNewsStruct)
+    except msgspec.DecodeError as e:
+        # Same shape as FastAPI's request validation errors
+        error_type = "value_error" if isinstance(e, msgspec.ValidationError) else "json_invalid"
+        raise HTTPException(422, [{"loc": ["body"], "msg": str(e), "type": error_type}])
     
     try:
-        results = await analyzer.analyze_batch(request.news, request_id)
+        results = await analyzer.analyze_batch(batch.news, request_id)
         
-        # Send webhook if configured
+        # Send webhook after the response so retries don't delay it
         if webhook_manager:
-            await webhook_manager.send_batch_results(results, request_id)
+            background_tasks.add_task(webhook_manager.send_batch_results, results, request_id)
         
-        return {"results": results, "request_id": request_id}
+        return ORJSONResponse({"results": results, "request_id": request_id})
         
     except Exception as e:
         logger.error(f"[{request_id}] REST analysis error: {str(e)}")
@@ -269,7 +336,8 @@ async def webhook_test(_: bool = Depends(verify_token)):
         "lang": "en"
     }]
     
-    await webhook_manager.send_batch_results(test_results, "webhook_test")
+    # Test results never change, so bypass duplicate suppression
+    await webhook_manager.send_batch_results(test_results, "webhook_test", dedup=False)
     return {"message": "Webhook test sent"}
 
 @app.get("/metrics")
@@ -288,10 +356,14 @@ async def metrics():
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
+    workers = int(os.getenv("WORKERS", 2))
     uvicorn.run(
         "mcp_news_main:app",
         host="0.0.0.0",
         port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
         reload=False,
         log_level="info"
     )
\ No newline at end of file
@@ -5,18 +5,33 @@ Combines keyword filtering with LLM confirmation for cost-effective analysis
 
 import os
 import re
+import time
 import asyncio
 import logging
+from bisect import bisect_right
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
 from datetime import datetime
-import json
 import aiohttp
+import orjson
+import ahocorasick
+import xxhash
 
-from response_models import NewsAnalysisResponse, ImpactType
+from response_models import NewsAnalysisResponse, NewsItemStruct, ImpactType
 from cache_manager import CacheManager
 
 logger = logging.getLogger(__name__)
 
+# Static part of the OpenAI chat payload, serialized once; the user message goes in between
+LLM_BODY_HEAD = orjson.dumps({
+    "model": "gpt-4",
+    "max_tokens": 200,
+    "temperature": 0.1
+})[:-1] + b',"messages":[' + orjson.dumps(
+    {"role": "system", "content": "You are a cryptocurrency market analyst."}
+) + b','
+LLM_BODY_TAIL = b']}'
+
 class CryptoNewsAnalyzer:
     """
     Advanced cryptocurrency news analyzer with hybrid AI approach:
@@ -27,6 +42,24 @@ class CryptoNewsAnalyzer:
     def __init__(self, cache_manager: CacheManager):
         self.cache = cache_manager
         
+        # In-process L1 cache in front of Redis (LRU, cache key -> (expires_at, value)).
+        # Entries live much shorter than the 12h Redis TTL so stale results age out.
+        self._local: OrderedDict = OrderedDict()
+        self._local_max = int(os.getenv("LOCAL_CACHE_SIZE", 4096))
+        self._local_ttl = int(os.getenv("LOCAL_CACHE_TTL", 300))
+        
+        # Max concurrent item analyses (LLM calls) per batch
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", 16))
+        
+        # In-flight analyses keyed by cache key (request coalescing)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Long-lived HTTP session for LLM calls (reuses TCP/TLS connections)
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=300, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=15)
+        )
+        
         # Positive sentiment keywords with weights
         self.positive_keywords = {
             'surge': 10, 'soar': 10, 'rally': 9, 'pump': 8, 'moon': 8,
@@ -46,93 +79,220 @@ class CryptoNewsAnalyzer:
             'red': 5, 'correction': 7, 'dip': 5, 'panic': 8, 'fear': 7
         }
         
-        # Cryptocurrency patterns for detection
-        self.crypto_patterns = {
-            r'\bbtc\b|\bbitcoin\b': 'BTC',
-            r'\beth\b|\bethereum\b': 'ETH', 
-            r'\bbnb\b|\bbinance\b': 'BNB',
-            r'\bada\b|\bcardano\b': 'ADA',
-            r'\bsol\b|\bsolana\b': 'SOL',
-            r'\bxrp\b|\bripple\b': 'XRP',
-            r'\bdot\b|\bpolkadot\b': 'DOT',
-            r'\bavax\b|\bavalanche\b': 'AVAX',
-            r'\bmatic\b|\bpolygon\b': 'MATIC',
-            r'\blink\b|\bchainlink\b': 'LINK'
+        # Cryptocurrency aliases (lowercase whole words) -> ticker for detection
+        self.coin_aliases = {
+            'btc': 'BTC', 'bitcoin': 'BTC',
+            'eth': 'ETH', 'ethereum': 'ETH',
+            'bnb': 'BNB', 'binance': 'BNB',
+            'ada': 'ADA', 'cardano': 'ADA',
+            'sol': 'SOL', 'solana': 'SOL',
+            'xrp': 'XRP', 'ripple': 'XRP',
+            'dot': 'DOT', 'polkadot': 'DOT',
+            'avax': 'AVAX', 'avalanche': 'AVAX',
+            'matic': 'MATIC', 'polygon': 'MATIC',
+            'link': 'LINK', 'chainlink': 'LINK'
         }
         
         # Language detection patterns
         self.arabic_pattern = re.compile(r'[\u0600-\u06FF]')
         
+        # Aho-Corasick automatons built from the tables above (single linear scan)
+        self._sent_ac = ahocorasick.Automaton()
+        for keyword, weight in self.positive_keywords.items():
+            self._sent_ac.add_word(keyword.lower(), (len(keyword), weight))
+        for keyword, weight in self.negative_keywords.items():
+            self._sent_ac.add_word(keyword.lower(), (len(keyword), -weight))
+        self._sent_ac.make_automaton()
+        
+        # Coins are found by intersecting the text's word tokens with coin_aliases
+        self._token_re = re.compile(r'\w+')
+        
+    async def aclose(self):
+        """Close the shared HTTP session"""
+        if not self._http.closed:
+            await self._http.close()
+    
     async def analyze_single(self, title: str, summary: str, request_id: str) -> NewsAnalysisResponse:
         """Analyze single news item with caching"""
         
         # Create cache key
-        cache_key = f"news:{hash(title + summary)}"
+        cache_key = self._cache_key(title, summary)
+        
+        # Check in-process cache, then Redis
+        local_result = self._local_get(cache_key)
+        if local_result:
+            logger.info(f"[{request_id}] Local cache hit for analysis")
+            return NewsAnalysisResponse(**local_result)
         
-        # Check cache first
         cached_result = await self.cache.get(cache_key)
         if cached_result:
             logger.info(f"[{request_id}] Cache hit for analysis")
+            self._local_put(cache_key, cached_result)
             return NewsAnalysisResponse(**cached_result)
         
         # Perform analysis
-        result = await self._analyze_news_item(title, summary, request_id)
+        result = await self._run_miss(cache_key, title, summary, request_id)
         
-        # Cache result for 12 hours
-        await self.cache.set(cache_key, result.dict(), ttl=43200)
+        # Cache result locally and in Redis for 12 hours
+        payload = result.model_dump()
+        self._local_put(cache_key, payload)
+        await self.cache.set(cache_key, payload, ttl=43200)
         
         return result
     
-    async def analyze_batch(self, news_items: List[Dict], request_id: str) -> List[Dict]:
+    async def analyze_batch(self, news_items: List[NewsItemStruct], request_id: str) -> List[Dict]:
         """Analyze batch of news items efficiently"""
         
         logger.info(f"[{request_id}] Starting batch analysis of {len(news_items)} items")
         
-        # Process items concurrently
-        tasks = []
-        for i, item in enumerate(news_items):
-            task = self._analyze_news_item(
-                item.get('title', ''), 
-                item.get('summary', ''), 
-                f"{request_id}_item_{i}"
-            )
-            tasks.append(task)
+        # Look up every item in one MGET, then only analyze the misses
+        keys = [
+            self._cache_key(item.title, item.summary)
+            for item in news_items
+        ]
+        cached = await self.cache.mget(keys)
+        miss_idx = [i for i, value in enumerate(cached) if not value]
+        
+        if len(miss_idx) < len(news_items):
+            logger.info(f"[{request_id}] Cache hit for {len(news_items) - len(miss_idx)} items")
+        
+        # Score all misses in one keyword scan, then process them with bounded concurrency
+        keyword_results = self._keyword_analysis_batch([
+            f"{news_items[i].title} {news_items[i].summary}".lower()
+            for i in miss_idx
+        ])
+        
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def run(i: int, keyword_result: Tuple[ImpactType, int]) -> NewsAnalysisResponse:
+            item = news_items[i]
+            async with semaphore:
+                return await self._run_miss(
+                    keys[i],
+                    item.title, 
+                    item.summary, 
+                    f"{request_id}_item_{i}",
+                    keyword_result
+                )
+        
+        tasks = [run(i, keyword_result) for i, keyword_result in zip(miss_idx, keyword_results)]
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        # Convert results to dict format and handle exceptions
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
+        # Merge fresh results with cached ones, handling exceptions
+        processed_results = list(cached)
+        to_cache = {}
+        for i, result in zip(miss_idx, results):
+            if isinstance(result, BaseException):
                 logger.error(f"[{request_id}] Item {i} failed: {str(result)}")
-                processed_results.append({
+                processed_results[i] = {
                     "impact": "Neutral",
                     "confidence": 0,
                     "affected_coins": [],
                     "summary": "Analysis failed",
                     "lang": "en",
                     "error": str(result)
-                })
+                }
             else:
-                processed_results.append(result.dict())
+                processed_results[i] = result.model_dump()
+                to_cache[keys[i]] = processed_results[i]
+        
+        # Cache fresh results for 12 hours in one pipelined write
+        if to_cache:
+            await self.cache.mset(to_cache, ttl=43200)
         
         logger.info(f"[{request_id}] Batch analysis completed")
         return processed_results
     
-    async def _analyze_news_item(self, title: str, summary: str, item_id: str) -> NewsAnalysisResponse:
+    def _cache_key(self, title: str, summary: str) -> str:
+        """Build a stable Redis cache key for a news item (same across restarts/workers)"""
+        hasher = xxhash.xxh3_64()
+        hasher.update(title.encode())
+        hasher.update(b"\x00")
+        hasher.update(summary.encode())
+        return f"news:{hasher.hexdigest()}"
+    
+    def _local_get(self, cache_key: str) -> Optional[Dict]:
+        """Get a result from the in-process LRU cache (expired entries are misses)"""
+        entry = self._local.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[cache_key]
+            return None
+        self._local.move_to_end(cache_key)
+        return value
+    
+    def _local_put(self, cache_key: str, value: Dict):
+        """Store a result in the in-process LRU cache, evicting the oldest entry"""
+        self._local[cache_key] = (time.monotonic() + self._local_ttl, value)
+        self._local.move_to_end(cache_key)
+        if len(self._local) > self._local_max:
+            self._local.popitem(last=False)
+    
+    async def _run_miss(
+        self, 
+        cache_key: str, 
+        title: str, 
+        summary: str, 
+        item_id: str, 
+        keyword_result: Optional[Tuple[ImpactType, int]] = None
+    ) -> NewsAnalysisResponse:
+        """
+        Analyze a news item that was not found in cache.
+        Concurrent misses for the same key share one in-flight analysis.
+        """
+        
+        inflight = self._inflight.get(cache_key)
+        while inflight:
+            logger.info(f"[{item_id}] Joining in-flight analysis")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise  # This task itself was cancelled
+                # Only the leading task was cancelled; take over (or join a new leader)
+                logger.info(f"[{item_id}] In-flight analysis cancelled, retrying")
+            inflight = self._inflight.get(cache_key)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            result = await self._analyze_news_item(title, summary, item_id, keyword_result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+    
+    async def _analyze_news_item(
+        self, 
+        title: str, 
+        summary: str, 
+        item_id: str, 
+        keyword_result: Optional[Tuple[ImpactType, int]] = None
+    ) -> NewsAnalysisResponse:
         """Core analysis logic for single news item"""
         
         # Combine title and summary for analysis
         full_text = f"{title} {summary}".lower()
         
-        # Phase 1: Keyword-based analysis
-        keyword_result = self._keyword_analysis(full_text)
+        # Phase 1: Keyword-based analysis (precomputed for batches)
+        if keyword_result is None:
+            keyword_result = self._keyword_analysis(full_text)
         
         # Detect language
-        lang = "ar" if self.arabic_pattern.search(title + summary) else "en"
+        lang = "ar" if self.arabic_pattern.search(full_text) else "en"
         
         # Detect affected coins
-        affected_coins = self._detect_coins(title + summary)
+        affected_coins = self._detect_coins(full_text)
         
         # Phase 2: Determine if LLM analysis needed
         needs_llm = self._needs_llm_analysis(keyword_result, full_text)
@@ -142,8 +302,9 @@ class CryptoNewsAnalyzer:
             try:
                 llm_result = await self._llm_analysis(title, summary, lang, item_id)
                 if llm_result:
-                    llm_result.affected_coins = affected_coins or llm_result.affected_coins
-                    return llm_result
+                    return llm_result.model_copy(
+                        update={"affected_coins": affected_coins or llm_result.affected_coins}
+                    )
             except Exception as e:
                 logger.warning(f"[{item_id}] LLM analysis failed: {str(e)}")
         
@@ -162,23 +323,67 @@ class CryptoNewsAnalyzer:
             low_confidence=True if confidence < 60 else False
         )
     
+    @staticmethod
+    def _is_word_match(text: str, end: int, length: int) -> bool:
+        """Check that a match ending at `end` sits on word boundaries"""
+        start = end - length + 1
+        if start > 0 and (text[start - 1].isalnum() or text[start - 1] == '_'):
+            return False
+        if end + 1 < len(text) and (text[end + 1].isalnum() or text[end + 1] == '_'):
+            return False
+        return True
+    
     def _keyword_analysis(self, text: str) -> Tuple[ImpactType, int]:
         """Fast keyword-based sentiment analysis"""
         
         positive_score = 0
         negative_score = 0
         
-        # Score positive keywords
-        for keyword, weight in self.positive_keywords.items():
-            matches = len(re.findall(r'\b' + re.escape(keyword) + r'\b', text, re.IGNORECASE))
-            positive_score += matches * weight
+        # Score positive (+weight) and negative (-weight) keywords in one pass
+        for end, (length, weight) in self._sent_ac.iter(text):
+            if not self._is_word_match(text, end, length):
+                continue
+            if weight > 0:
+                positive_score += weight
+            else:
+                negative_score -= weight
         
-        # Score negative keywords
-        for keyword, weight in self.negative_keywords.items():
-            matches = len(re.findall(r'\b' + re.escape(keyword) + r'\b', text, re.IGNORECASE))
-            negative_score += matches * weight
+        return self._score_impact(positive_score, negative_score)
+    
+    def _keyword_analysis_batch(self, texts: List[str]) -> List[Tuple[ImpactType, int]]:
+        """
+        Keyword analysis for a whole batch in a single automaton scan.
+        Texts are joined with newlines and hits are mapped back to items by offset.
+        """
+        
+        if not texts:
+            return []
+        
+        joined = "\n".join(texts)
+        starts = [0]
+        for text in texts[:-1]:
+            starts.append(starts[-1] + len(text) + 1)
+        
+        positive_scores = [0] * len(texts)
+        negative_scores = [0] * len(texts)
+        
+        for end, (length, weight) in self._sent_ac.iter(joined):
+            if not self._is_word_match(joined, end, length):
+                continue
+            i = bisect_right(starts, end) - 1
+            if weight > 0:
+                positive_scores[i] += weight
+            else:
+                negative_scores[i] -= weight
+        
+        return [
+            self._score_impact(positive, negative)
+            for positive, negative in zip(positive_scores, negative_scores)
+        ]
+    
+    def _score_impact(self, positive_score: int, negative_score: int) -> Tuple[ImpactType, int]:
+        """Turn keyword scores into impact and confidence"""
         
-        # Determine impact and confidence
         if positive_score > negative_score and positive_score > 5:
             impact = ImpactType.POSITIVE
             confidence = min(positive_score * 2, 100)
@@ -220,38 +425,29 @@ class CryptoNewsAnalyzer:
         prompt = self._create_llm_prompt(title, summary, lang)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {openai_key}",
-                    "Content-Type": "application/json"
-                }
+            headers = {
+                "Authorization": f"Bearer {openai_key}",
+                "Content-Type": "application/json"
+            }
+            
+            # Only the user message is encoded per call; the rest is pre-serialized
+            body = LLM_BODY_HEAD + orjson.dumps({"role": "user", "content": prompt}) + LLM_BODY_TAIL
+            
+            async with self._http.post(
+                "https://api.openai.com/v1/chat/completions",
+                headers=headers,
+                data=body
+            ) as response:
                 
-                payload = {
-                    "model": "gpt-4",
-                    "messages": [
-                        {"role": "system", "content": "You are a cryptocurrency market analyst."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "max_tokens": 200,
-                    "temperature": 0.1
-                }
+                if response.status != 200:
+                    logger.error(f"[{item_id}] LLM API error: {response.status}")
+                    return None
                 
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    timeout=10
-                ) as response:
-                    
-                    if response.status != 200:
-                        logger.error(f"[{item_id}] LLM API error: {response.status}")
-                        return None
-                    
-                    data = await response.json()
-                    result_text = data["choices"][0]["message"]["content"]
-                    
-                    # Parse LLM response
-                    return self._parse_llm_response(result_text, lang)
+                data = orjson.loads(await response.read())
+                result_text = data["choices"][0]["message"]["content"]
+                
+                # Parse LLM response
+                return self._parse_llm_response(result_text, lang)
         
         except Exception as e:
             logger.error(f"[{item_id}] LLM request failed: {str(e)}")
@@ -279,12 +475,13 @@ Focus on immediate market sentiment and price impact potential."""
         """Parse and validate LLM response"""
         
         try:
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if not json_match:
+            # Extract JSON from response (outermost braces, no regex backtracking)
+            start = response.find('{')
+            end = response.rfind('}')
+            if start == -1 or end < start:
                 return None
             
-            data = json.loads(json_match.group())
+            data = orjson.loads(response[start:end + 1])
             
             return NewsAnalysisResponse(
                 impact=ImpactType(data.get("impact", "Neutral")),
@@ -299,17 +496,12 @@ Focus on immediate market sentiment and price impact potential."""
             logger.error(f"Failed to parse LLM response: {str(e)}")
             return None
     
-    def _detect_coins(self, text: str) -> List[str]:
-        """Detect mentioned cryptocurrencies"""
-        
-        detected = []
-        text_lower = text.lower()
+    def _detect_coins(self, text_lower: str) -> List[str]:
+        """Detect mentioned cryptocurrencies (expects pre-lowercased text)"""
         
-        for pattern, coin in self.crypto_patterns.items():
-            if re.search(pattern, text_lower):
-                detected.append(coin)
+        tokens = set(self._token_re.findall(text_lower))
         
-        return list(set(detected))
+        return sorted({self.coin_aliases[token] for token in tokens & self.coin_aliases.keys()})
     
     def _generate_summary(self, title: str, impact: ImpactType, confidence: int, lang: str) -> str:
         """Generate executive summary for broadcasting"""
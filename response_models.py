@@ -1,25 +1,36 @@
 """
 Pydantic models for MCP-News v2.1
 Defines request/response schemas and validation
+
+Responses are rendered with ORJSONResponse (the app's default response class),
+so model dumps must stay orjson-serializable: str/int/float/bool/None, lists,
+dicts, Enum, datetime and UUID are supported natively.
 """
 
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field, validator
+from typing import Annotated, List, Literal, Optional, Dict, Any, Union
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator
 from enum import Enum
+from datetime import datetime
 
 class ImpactType(str, Enum):
+    """Impact constants for producer code; models validate impact as a Literal"""
     POSITIVE = "Positive"
     NEGATIVE = "Negative"
     NEUTRAL = "Neutral"
 
 class NewsItem(BaseModel):
     """Single news item for analysis"""
+    model_config = ConfigDict(frozen=True)
+    
     title: str = Field(..., min_length=1, max_length=500, description="News headline")
     summary: str = Field(..., min_length=1, max_length=2000, description="News description")
 
 class NewsAnalysisResponse(BaseModel):
     """Response model for news analysis results"""
-    impact: ImpactType = Field(..., description="Market impact assessment")
+    model_config = ConfigDict(frozen=True)
+    
+    impact: Literal["Positive", "Negative", "Neutral"] = Field(..., description="Market impact assessment")
     confidence: int = Field(..., ge=0, le=100, description="Confidence score 0-100")
     affected_coins: List[str] = Field(default_factory=list, description="List of affected cryptocurrencies")
     summary: str = Field(..., description="Executive summary for broadcasting")
@@ -27,10 +38,11 @@ class NewsAnalysisResponse(BaseModel):
     low_confidence: Optional[bool] = Field(default=False, description="Flag for keyword-only analysis")
     error: Optional[str] = Field(default=None, description="Error message if LLM failed")
     
-    @validator('affected_coins')
+    @field_validator('affected_coins')
+    @classmethod
     def validate_coins(cls, v):
-        # Convert to uppercase and remove duplicates
-        return list(set([coin.upper() for coin in v if coin]))
+        # Convert to uppercase and remove duplicates, keeping first-seen order
+        return list(dict.fromkeys(coin.upper() for coin in v if coin))
 
 class SingleNewsRequest(BaseModel):
     """Request for single news analysis"""
@@ -39,7 +51,16 @@ class SingleNewsRequest(BaseModel):
 
 class BatchNewsRequest(BaseModel):
     """Request for batch news analysis"""
-    news: List[NewsItem] = Field(..., min_items=1, max_items=50, description="Batch of news items")
+    news: List[NewsItem] = Field(..., min_length=1, max_length=50, description="Batch of news items")
+
+class NewsItemStruct(msgspec.Struct, frozen=True):
+    """Single news item decoded directly by msgspec (batch hot path)"""
+    title: Annotated[str, msgspec.Meta(min_length=1, max_length=500)]
+    summary: Annotated[str, msgspec.Meta(min_length=1, max_length=2000)]
+
+class BatchNewsStruct(msgspec.Struct, frozen=True):
+    """msgspec counterpart of BatchNewsRequest for decoding raw request bodies"""
+    news: Annotated[List[NewsItemStruct], msgspec.Meta(min_length=1, max_length=50)]
 
 class MCPRequest(BaseModel):
     """MCP JSON-RPC 2.0 request model"""
@@ -65,22 +86,34 @@ class HealthResponse(BaseModel):
     uptime: Optional[str] = Field(default=None, description="Service uptime")
 
 class WebhookPayload(BaseModel):
-    """Webhook notification payload"""
-    request_id: str = Field(..., description="Analysis request ID")
-    timestamp: str = Field(..., description="Analysis completion time")
-    total_items: int = Field(..., description="Number of analyzed items")
-    results: List[NewsAnalysisResponse] = Field(..., description="Analysis results")
-    summary_stats: Dict[str, int] = Field(default_factory=dict, description="Summary statistics")
+    """
+    Webhook notification payload (outbound only, not part of the OpenAPI schema)
+    timestamp is the ISO-8601 UTC completion time; summary_stats holds per-impact,
+    confidence and error counts
+    """
+    model_config = ConfigDict(frozen=True)
+    
+    request_id: str
+    timestamp: str
+    total_items: int
+    results: List[NewsAnalysisResponse]
+    summary_stats: Dict[str, int] = Field(default_factory=dict)
+
+class WebhookPayloadStruct(msgspec.Struct, frozen=True):
+    """msgspec mirror of WebhookPayload used to encode outbound webhooks"""
+    request_id: str
+    timestamp: datetime
+    total_items: int
+    results: List[Dict[str, Any]]
+    summary_stats: Dict[str, int] = {}
 
 class CacheStats(BaseModel):
     """Cache statistics model"""
     hits: int = Field(default=0, description="Cache hit count")
     misses: int = Field(default=0, description="Cache miss count")
     total: int = Field(default=0, description="Total requests")
-    hit_ratio: float = Field(default=0.0, description="Cache hit ratio")
     
-    @validator('hit_ratio', always=True)
-    def calculate_hit_ratio(cls, v, values):
-        total = values.get('total', 0)
-        hits = values.get('hits', 0)
-        return round(hits / total, 3) if total > 0 else 0.0
\ No newline at end of file
+    @computed_field(description="Cache hit ratio")
+    @property
+    def hit_ratio(self) -> float:
+        return round(self.hits / self.total, 3) if self.total > 0 else 0.0
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Tests for webhook delivery deduplication
+"""
+
+import asyncio
+import httpx
+
+import webhook_manager
+from webhook_manager import WebhookManager
+
+RESULTS = [{"impact": "Positive", "confidence": 90, "affected_coins": ["BTC"]}]
+
+
+def make_manager(monkeypatch, status_code: int, delay: float = 0):
+    """WebhookManager whose client posts to a mock transport; returns (manager, posts)"""
+    monkeypatch.setenv("WEBHOOK_URL", "http://webhook.test/hook")
+    monkeypatch.setattr(webhook_manager, "WEBHOOK_RETRY_BASE_DELAY", 0)
+    posts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        posts.append(request)
+        await asyncio.sleep(delay)
+        return httpx.Response(status_code)
+
+    manager = WebhookManager()
+    manager._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return manager, posts
+
+
+def test_same_results_for_different_requests_are_both_sent(monkeypatch):
+    manager, posts = make_manager(monkeypatch, 200)
+
+    async def run():
+        first = await manager.send_batch_results(RESULTS, "r1")
+        second = await manager.send_batch_results(RESULTS, "r2")
+        await manager.close()
+        return first, second
+
+    assert asyncio.run(run()) == (True, True)
+    assert len(posts) == 2
+
+
+def test_retried_request_is_sent_once(monkeypatch):
+    manager, posts = make_manager(monkeypatch, 200)
+
+    async def run():
+        first = await manager.send_batch_results(RESULTS, "r1")
+        second = await manager.send_batch_results(RESULTS, "r1")
+        await manager.close()
+        return first, second
+
+    assert asyncio.run(run()) == (True, True)
+    assert len(posts) == 1
+
+
+def test_concurrent_duplicates_share_failed_outcome(monkeypatch):
+    manager, posts = make_manager(monkeypatch, 500, delay=0.01)
+
+    async def run():
+        outcomes = await asyncio.gather(
+            *(manager.send_batch_results(RESULTS, "r1") for _ in range(3))
+        )
+        await manager.close()
+        return outcomes
+
+    assert asyncio.run(run()) == [False, False, False]
+    # One send with all its retries; the duplicates did not post
+    assert len(posts) == webhook_manager.WEBHOOK_MAX_ATTEMPTS
+
+
+def test_failed_send_can_be_retried(monkeypatch):
+    manager, posts = make_manager(monkeypatch, 500)
+
+    async def run():
+        first = await manager.send_batch_results(RESULTS, "r1")
+        await manager.close()
+        manager._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200))
+        )
+        second = await manager.send_batch_results(RESULTS, "r1")
+        await manager.close()
+        return first, second
+
+    assert asyncio.run(run()) == (False, True)
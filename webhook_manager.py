@@ -4,15 +4,47 @@ Handles webhook notifications for batch analysis results
 """
 
 import os
-import json
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any
-from datetime import datetime
-import aiohttp
-from response_models import WebhookPayload
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Union
+from datetime import datetime, timezone
+import httpx
+import msgspec
+import xxhash
+from response_models import WebhookPayloadStruct
 
 logger = logging.getLogger(__name__)
 
+# Delivery attempts per webhook and the first backoff delay in seconds (doubles each retry)
+WEBHOOK_MAX_ATTEMPTS = 3
+WEBHOOK_RETRY_BASE_DELAY = 0.1
+
+# Fail fast on unreachable endpoints (TCP connect / read); httpx has no total
+# timeout, so each attempt is also capped at WEBHOOK_TOTAL_TIMEOUT seconds
+WEBHOOK_TIMEOUT = httpx.Timeout(10.0, connect=2.0, read=5.0)
+WEBHOOK_TOTAL_TIMEOUT = 10
+
+# HTTP/2 lets concurrent deliveries multiplex over one connection when the receiver supports it
+WEBHOOK_LIMITS = httpx.Limits(max_connections=20, keepalive_expiry=60)
+
+# Wire formats for webhook bodies (WEBHOOK_FORMAT) and their content types
+WEBHOOK_CONTENT_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "ndjson": "application/x-ndjson"
+}
+
+# The same request_id with identical results is not posted again within the TTL
+WEBHOOK_DEDUP_MAX_ENTRIES = 10000
+WEBHOOK_DEDUP_TTL = 300
+
+json_encoder = msgspec.json.Encoder()
+msgpack_encoder = msgspec.msgpack.Encoder()
+# Sorted keys so equal results always hash the same
+dedup_encoder = msgspec.json.Encoder(order="sorted")
+
 class WebhookManager:
     """Manages webhook notifications for analysis results"""
     
@@ -20,33 +52,87 @@ class WebhookManager:
         self.webhook_url = os.getenv("WEBHOOK_URL")
         self.webhook_secret = os.getenv("WEBHOOK_SECRET")
         self.enabled = bool(self.webhook_url)
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        self.webhook_format = os.getenv("WEBHOOK_FORMAT", "json").lower()
+        if self.webhook_format not in WEBHOOK_CONTENT_TYPES:
+            logger.warning(f"Unknown WEBHOOK_FORMAT '{self.webhook_format}', using json")
+            self.webhook_format = "json"
+        
+        # Request headers are fixed for the lifetime of the manager
+        self._headers = {
+            "Content-Type": WEBHOOK_CONTENT_TYPES[self.webhook_format],
+            "User-Agent": "MCP-News-v2.1-Webhook"
+        }
+        if self.webhook_secret:
+            self._headers["X-Webhook-Secret"] = self.webhook_secret
+        
+        # Delivered webhooks keyed by (request_id, results hash) -> expiry time,
+        # and sends in flight for a key (concurrent duplicates await their outcome)
+        self._delivered: OrderedDict = OrderedDict()
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
         
         if self.enabled:
             logger.info("Webhook notifications enabled")
         else:
             logger.info("Webhook notifications disabled (no URL configured)")
     
-    async def send_batch_results(self, results: List[Dict], request_id: str) -> bool:
-        """Send batch analysis results via webhook"""
+    async def send_batch_results(self, results: List[Dict], request_id: str, dedup: bool = True) -> bool:
+        """Send batch analysis results via webhook, skipping recent duplicates"""
         
         if not self.enabled:
             return True  # Skip if disabled
         
+        if not dedup:
+            return await self._deliver(results, request_id)
+        
+        try:
+            dedup_key = (request_id, xxhash.xxh3_64_intdigest(dedup_encoder.encode(results)))
+        except Exception as e:
+            logger.error(f"Webhook error for {request_id}: {str(e)}")
+            return False
+        
+        # An identical send is in flight - share its outcome
+        pending = self._pending.get(dedup_key)
+        if pending:
+            logger.info(f"Joining in-flight webhook for {request_id}")
+            return await asyncio.shield(pending)
+        
+        if self._is_duplicate(dedup_key):
+            logger.info(f"Skipping duplicate webhook for {request_id}")
+            return True
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[dedup_key] = future
+        success = False
+        try:
+            success = await self._deliver(results, request_id)
+            if success:
+                self._mark_delivered(dedup_key)
+            return success
+        finally:
+            self._pending.pop(dedup_key, None)
+            future.set_result(success)
+    
+    async def _deliver(self, results: List[Dict], request_id: str) -> bool:
+        """Build and send the webhook payload for one batch"""
+        
         try:
             # Generate summary statistics
             summary_stats = self._generate_summary_stats(results)
             
-            # Create webhook payload
-            payload = WebhookPayload(
+            # Create webhook payload (results are already validated analysis
+            # dicts, so skip re-validating them through WebhookPayload)
+            payload = WebhookPayloadStruct(
                 request_id=request_id,
-                timestamp=datetime.utcnow().isoformat() + "Z",
+                timestamp=datetime.now(timezone.utc),
                 total_items=len(results),
                 results=results,
                 summary_stats=summary_stats
             )
             
             # Send webhook
-            success = await self._send_webhook(payload.dict())
+            success = await self._send_webhook(payload)
             
             if success:
                 logger.info(f"Webhook sent successfully for {request_id}")
@@ -59,70 +145,118 @@ class WebhookManager:
             logger.error(f"Webhook error for {request_id}: {str(e)}")
             return False
     
-    async def _send_webhook(self, payload: Dict[str, Any]) -> bool:
+    async def send_many(self, batches: List[Tuple[List[Dict], str]]) -> List[bool]:
+        """
+        Send several batch results concurrently over the shared client
+        The connection limit caps how many deliveries are in flight
+        """
+        return await asyncio.gather(
+            *(self.send_batch_results(results, request_id) for results, request_id in batches)
+        )
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=WEBHOOK_TIMEOUT,
+                limits=WEBHOOK_LIMITS
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+    
+    def _is_duplicate(self, key: Tuple[str, int]) -> bool:
+        """Check whether an identical webhook was delivered within the dedup TTL"""
+        expires_at = self._delivered.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._delivered[key]
+            return False
+        return True
+    
+    def _mark_delivered(self, key: Tuple[str, int]):
+        """Remember a delivered webhook, evicting the oldest entries past the size cap"""
+        now = time.monotonic()
+        self._delivered[key] = now + WEBHOOK_DEDUP_TTL
+        self._delivered.move_to_end(key)
+        # Entries share one TTL, so expired ones sit at the front
+        while self._delivered:
+            oldest_expiry = next(iter(self._delivered.values()))
+            if oldest_expiry >= now and len(self._delivered) <= WEBHOOK_DEDUP_MAX_ENTRIES:
+                break
+            self._delivered.popitem(last=False)
+    
+    def _encode(self, payload: Union[WebhookPayloadStruct, Dict[str, Any]]) -> bytes:
+        """Encode a webhook body in the configured wire format"""
+        if self.webhook_format == "msgpack":
+            # Datetimes use the native msgpack timestamp extension
+            return msgpack_encoder.encode(payload)
+        if self.webhook_format == "ndjson":
+            # First line is the envelope without results, then one line per result
+            if isinstance(payload, msgspec.Struct):
+                envelope = msgspec.structs.asdict(payload)
+            else:
+                envelope = dict(payload)
+            results = envelope.pop("results", [])
+            return json_encoder.encode(envelope) + b"\n" + json_encoder.encode_lines(results)
+        # UTC datetimes render as ISO-8601 with a "Z" suffix
+        return json_encoder.encode(payload)
+    
+    async def _send_webhook(self, payload: Union[WebhookPayloadStruct, Dict[str, Any]]) -> bool:
         """Send HTTP webhook request"""
         
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "User-Agent": "MCP-News-v2.1-Webhook"
-            }
-            
-            # Add secret header if configured
-            if self.webhook_secret:
-                headers["X-Webhook-Secret"] = self.webhook_secret
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.webhook_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=10
-                ) as response:
-                    
-                    if response.status in [200, 201, 202]:
-                        return True
-                    else:
-                        logger.error(f"Webhook HTTP error: {response.status}")
-                        return False
-        
-        except aiohttp.ClientTimeout:
-            logger.error("Webhook timeout")
-            return False
+            body = self._encode(payload)
         except Exception as e:
-            logger.error(f"Webhook request error: {str(e)}")
+            logger.error(f"Webhook payload encoding error: {str(e)}")
             return False
+        
+        # Retry transient failures (network errors, timeouts, 429/5xx) with exponential backoff
+        for attempt in range(1, WEBHOOK_MAX_ATTEMPTS + 1):
+            try:
+                client = await self._get_client()
+                response = await asyncio.wait_for(
+                    client.post(self.webhook_url, content=body, headers=self._headers),
+                    WEBHOOK_TOTAL_TIMEOUT
+                )
+                
+                if response.status_code in [200, 201, 202]:
+                    return True
+                
+                logger.error(f"Webhook HTTP error: {response.status_code} (attempt {attempt}/{WEBHOOK_MAX_ATTEMPTS})")
+                if response.status_code < 500 and response.status_code != 429:
+                    return False  # Client errors won't succeed on retry
+            
+            except (httpx.TimeoutException, asyncio.TimeoutError):
+                logger.error(f"Webhook timeout (attempt {attempt}/{WEBHOOK_MAX_ATTEMPTS})")
+            except Exception as e:
+                logger.error(f"Webhook request error: {str(e)} (attempt {attempt}/{WEBHOOK_MAX_ATTEMPTS})")
+            
+            if attempt < WEBHOOK_MAX_ATTEMPTS:
+                await asyncio.sleep(WEBHOOK_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        
+        return False
     
     def _generate_summary_stats(self, results: List[Dict]) -> Dict[str, int]:
         """Generate summary statistics from analysis results"""
         
-        stats = {
-            "positive": 0,
-            "negative": 0,
-            "neutral": 0,
-            "high_confidence": 0,
-            "low_confidence": 0,
-            "errors": 0
-        }
+        impacts = Counter(result.get("impact", "Neutral").lower() for result in results)
+        high_confidence = sum(1 for result in results if result.get("confidence", 0) > 75)
+        errors = sum(1 for result in results if result.get("error"))
         
-        for result in results:
-            # Count impacts
-            impact = result.get("impact", "Neutral").lower()
-            if impact in stats:
-                stats[impact] += 1
-            
-            # Count confidence levels
-            confidence = result.get("confidence", 0)
-            if confidence > 75:
-                stats["high_confidence"] += 1
-            else:
-                stats["low_confidence"] += 1
-            
-            # Count errors
-            if result.get("error"):
-                stats["errors"] += 1
-        
-        return stats
+        return {
+            "positive": impacts["positive"],
+            "negative": impacts["negative"],
+            "neutral": impacts["neutral"],
+            "high_confidence": high_confidence,
+            "low_confidence": len(results) - high_confidence,
+            "errors": errors
+        }
     
     async def test_webhook(self) -> Dict[str, Any]:
         """Test webhook connectivity"""
@@ -132,7 +266,7 @@ class WebhookManager:
         
         test_payload = {
             "test": True,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.now(timezone.utc),
             "service": "mcp-news-v2.1"
         }
         